@@ -4,11 +4,14 @@ Enhanced Gradebot Client for Project 2
 Displays a detailed rubric table and tests all requirements
 """
 import requests
-import json
+from requests.adapters import HTTPAdapter
+import orjson
 import sqlite3
 import os
 import sys
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import time
 from typing import Tuple, List
 import base64
 import jwt as pyjwt
@@ -18,12 +21,35 @@ from colorama import init, Fore, Back, Style
 # Initialize colorama for Windows
 init(autoreset=True)
 
+DB_FILE = "totally_not_my_privateKeys.db"
+EXPECTED_COLUMNS = frozenset(("kid", "key", "exp"))
+
+
+def _b64url_json(seg: str) -> dict:
+    """Decode a base64url JWT segment with exactly the padding it needs and parse its JSON"""
+    return orjson.loads(base64.urlsafe_b64decode(seg.encode("ascii") + b"=" * (-len(seg) % 4)))
+
+
 class GradebotClient:
     def __init__(self, base_url="http://127.0.0.1:8080"):
         self.base_url = base_url
         self.results = []
         self.total_points = 0
         self.max_points = 0
+        # One keep-alive connection pool for every request to the server
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+        self.session.headers.update({"Connection": "keep-alive"})
+        # expired flag -> (status_code, token segments, header, payload) from one /auth call
+        self._auth_cache = {}
+        self._auth_lock = threading.Lock()
+        # (status_code, parsed JSON) from the one GET of the JWKS endpoint
+        self._jwks_result = None
+        self._jwks_lock = threading.Lock()
+        # Database file stat and read-only connection, opened once and shared by all checks
+        self._db_stat = None
+        self._dbconn = None
+        self._db_lock = threading.Lock()
 
     def add_test(self, name: str, points: int, test_func, description: str = ""):
         """Add a test to the rubric"""
@@ -44,33 +70,81 @@ class GradebotClient:
 
         self.results.append([name, f"{points_earned}/{points}", status, description])
 
+    def _fetch_jwks(self):
+        """GET /.well-known/jwks.json once and cache (status_code, parsed JSON or None)"""
+        with self._jwks_lock:
+            if self._jwks_result is None:
+                response = self.session.get(f"{self.base_url}/.well-known/jwks.json", timeout=5)
+                data = None
+                if response.status_code == 200:
+                    try:
+                        data = orjson.loads(response.content)
+                    except ValueError:
+                        pass
+                self._jwks_result = (response.status_code, data)
+            return self._jwks_result
+
+    def _get_auth(self, expired: bool = False):
+        """POST /auth (or /auth?expired=1) once and cache the decoded token"""
+        with self._auth_lock:
+            if expired not in self._auth_cache:
+                url = f"{self.base_url}/auth?expired=1" if expired else f"{self.base_url}/auth"
+                response = self.session.post(url, timeout=5)
+                parts, header, payload = [], None, None
+                if response.status_code == 200:
+                    parts = orjson.loads(response.content)["token"].split(".")
+                    if len(parts) == 3:
+                        # Decode header and payload (without verification for testing)
+                        header = _b64url_json(parts[0])
+                        payload = _b64url_json(parts[1])
+                self._auth_cache[expired] = (response.status_code, parts, header, payload)
+            return self._auth_cache[expired]
+
+    def _get_db_stat(self):
+        """Stat the database file once; None if it does not exist"""
+        if self._db_stat is None:
+            try:
+                self._db_stat = os.stat(DB_FILE)
+            except OSError:
+                return None
+        return self._db_stat
+
+    def _get_db(self) -> sqlite3.Connection:
+        """Open the shared read-only database connection on first use (hold _db_lock)"""
+        if self._dbconn is None:
+            self._dbconn = sqlite3.connect(
+                f"file:{DB_FILE}?mode=ro", uri=True, timeout=1, check_same_thread=False
+            )
+        return self._dbconn
+
+    def _close_db(self):
+        with self._db_lock:
+            if self._dbconn is not None:
+                self._dbconn.close()
+                self._dbconn = None
+
     def test_database_file_exists(self) -> bool:
         """Test if the database file exists with correct name"""
-        return os.path.exists("totally_not_my_privateKeys.db")
+        return self._get_db_stat() is not None
 
     def test_database_schema(self) -> bool:
         """Test if database schema is correct"""
         try:
-            conn = sqlite3.connect("totally_not_my_privateKeys.db")
-            cursor = conn.execute("PRAGMA table_info(keys)")
-            columns = cursor.fetchall()
-            conn.close()
-            
-            expected_columns = ['kid', 'key', 'exp']
-            found_columns = [col[1] for col in columns]
+            with self._db_lock:
+                cursor = self._get_db().execute("PRAGMA table_info(keys)")
+                columns = cursor.fetchall()
             
             # Check if all expected columns exist
-            return all(col in found_columns for col in expected_columns)
+            return EXPECTED_COLUMNS.issubset(col[1] for col in columns)
         except Exception:
             return False
 
     def test_database_has_keys(self) -> bool:
         """Test if database contains keys"""
         try:
-            conn = sqlite3.connect("totally_not_my_privateKeys.db")
-            cursor = conn.execute("SELECT COUNT(*) FROM keys")
-            count = cursor.fetchone()[0]
-            conn.close()
+            with self._db_lock:
+                cursor = self._get_db().execute("SELECT COUNT(*) FROM keys")
+                count = cursor.fetchone()[0]
             return count > 0
         except Exception:
             return False
@@ -78,11 +152,10 @@ class GradebotClient:
     def test_jwks_endpoint(self) -> bool:
         """Test JWKS endpoint returns valid JSON"""
         try:
-            response = requests.get(f"{self.base_url}/.well-known/jwks.json", timeout=5)
-            if response.status_code != 200:
+            status, jwks_data = self._fetch_jwks()
+            if status != 200:
                 return False
             
-            jwks_data = response.json()
             return "keys" in jwks_data and len(jwks_data["keys"]) > 0
         except Exception:
             return False
@@ -90,8 +163,7 @@ class GradebotClient:
     def test_jwks_structure(self) -> bool:
         """Test JWKS structure is correct"""
         try:
-            response = requests.get(f"{self.base_url}/.well-known/jwks.json", timeout=5)
-            jwks_data = response.json()
+            _, jwks_data = self._fetch_jwks()
             
             for key in jwks_data["keys"]:
                 required_fields = ["kty", "use", "alg", "kid", "n", "e", "exp"]
@@ -106,11 +178,11 @@ class GradebotClient:
     def test_auth_endpoint(self) -> bool:
         """Test auth endpoint returns JWT"""
         try:
-            response = requests.post(f"{self.base_url}/auth", timeout=5)
+            response = self.session.post(f"{self.base_url}/auth", timeout=5)
             if response.status_code != 200:
                 return False
             
-            auth_data = response.json()
+            auth_data = orjson.loads(response.content)
             return "token" in auth_data and "kid" in auth_data
         except Exception:
             return False
@@ -118,19 +190,12 @@ class GradebotClient:
     def test_jwt_validity(self) -> bool:
         """Test JWT token is valid and properly formed"""
         try:
-            response = requests.post(f"{self.base_url}/auth", timeout=5)
-            auth_data = response.json()
-            token = auth_data["token"]
+            _, parts, header, payload = self._get_auth(expired=False)
             
             # Check token structure
-            parts = token.split(".")
             if len(parts) != 3:
                 return False
             
-            # Decode header and payload (without verification for testing)
-            header = json.loads(base64.urlsafe_b64decode(parts[0] + "=="))
-            payload = json.loads(base64.urlsafe_b64decode(parts[1] + "=="))
-            
             # Check required claims
             required_claims = ["sub", "iat", "exp"]
             return all(claim in payload for claim in required_claims)
@@ -140,21 +205,12 @@ class GradebotClient:
     def test_expired_functionality(self) -> bool:
         """Test expired parameter functionality"""
         try:
-            response = requests.post(f"{self.base_url}/auth?expired=1", timeout=5)
-            if response.status_code != 200:
-                return False
-            
-            auth_data = response.json()
-            if "token" not in auth_data:
+            status, parts, header, payload = self._get_auth(expired=True)
+            if status != 200 or payload is None:
                 return False
             
-            # Decode payload to check expiration
-            token = auth_data["token"]
-            parts = token.split(".")
-            payload = json.loads(base64.urlsafe_b64decode(parts[1] + "=="))
-            
             # Token should be expired (exp < now)
-            return payload["exp"] < int(datetime.utcnow().timestamp())
+            return payload["exp"] < int(time.time())
         except Exception:
             return False
 
@@ -162,13 +218,13 @@ class GradebotClient:
         """Test JSON authentication support"""
         try:
             json_payload = {"username": "userABC", "password": "password123"}
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/auth", 
                 json=json_payload,
                 headers={'Content-Type': 'application/json'},
                 timeout=5
             )
-            return response.status_code == 200 and "token" in response.json()
+            return response.status_code == 200 and "token" in orjson.loads(response.content)
         except Exception:
             return False
 
@@ -176,7 +232,7 @@ class GradebotClient:
         """Test JSON authentication rejects invalid credentials"""
         try:
             json_payload = {"username": "wrong", "password": "wrong"}
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/auth", 
                 json=json_payload,
                 headers={'Content-Type': 'application/json'},
@@ -189,8 +245,8 @@ class GradebotClient:
     def test_server_running(self) -> bool:
         """Test if server is running on correct port"""
         try:
-            response = requests.get(f"{self.base_url}/.well-known/jwks.json", timeout=2)
-            return response.status_code == 200
+            status, _ = self._fetch_jwks()
+            return status == 200
         except Exception:
             return False
 
@@ -200,7 +256,7 @@ class GradebotClient:
         print(f"CSCE 3550 - PROJECT 2 GRADEBOT CLIENT")
         print(f"{'='*80}{Style.RESET_ALL}")
         print(f"Testing server at: {self.base_url}")
-        print(f"Database file: totally_not_my_privateKeys.db")
+        print(f"Database file: {DB_FILE}")
         print()
 
         # Define all tests with points
@@ -209,7 +265,7 @@ class GradebotClient:
              "Server responds on port 8080"),
             
             ("Database File Exists", 10, self.test_database_file_exists,
-             "File 'totally_not_my_privateKeys.db' present"),
+             f"File '{DB_FILE}' present"),
             
             ("Database Schema", 15, self.test_database_schema,
              "Correct table schema (kid, key, exp)"),
@@ -239,12 +295,24 @@ class GradebotClient:
              "Rejects invalid credentials")
         ]
 
-        # Run all tests
-        for name, points, test_func, description in tests:
-            self.add_test(name, points, test_func, description)
+        # Warm the connection pool (and the JWKS cache) so the workers reuse an open connection
+        try:
+            self._fetch_jwks()
+        except Exception:
+            pass
+
+        try:
+            # Run all tests concurrently (they are I/O-bound and independent),
+            # then score them in rubric order; future.result re-raises test errors
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                futures = [executor.submit(test_func) for _, _, test_func, _ in tests]
+                for (name, points, _, description), future in zip(tests, futures):
+                    self.add_test(name, points, future.result, description)
 
-        # Display results
-        self.display_rubric()
+            # Display results
+            self.display_rubric()
+        finally:
+            self._close_db()
 
     def display_rubric(self):
         """Display the rubric table with results"""
@@ -253,12 +321,8 @@ class GradebotClient:
         
         headers = ["Test Case", "Points", "Status", "Description"]
         
-        # Create colored table
-        colored_results = []
-        for row in self.results:
-            colored_results.append(row)
-        
-        print(tabulate(colored_results, headers=headers, tablefmt="grid", maxcolwidths=[25, 8, 10, 35]))
+        # Status cells already carry their colour codes; tabulate measures visible width
+        print(tabulate(self.results, headers=headers, tablefmt="grid", maxcolwidths=[25, 8, 10, 35]))
         
         # Summary
         percentage = (self.total_points / self.max_points) * 100 if self.max_points > 0 else 0
@@ -279,25 +343,27 @@ class GradebotClient:
         print(f"{'='*80}{Style.RESET_ALL}")
         
         # Additional info
-        if os.path.exists("totally_not_my_privateKeys.db"):
-            size = os.path.getsize("totally_not_my_privateKeys.db")
+        db_stat = self._get_db_stat()
+        if db_stat is not None:
+            size = db_stat.st_size
             print(f"\n{Fore.CYAN}Database Info:{Style.RESET_ALL}")
             print(f"  File size: {size:,} bytes")
             
             try:
-                conn = sqlite3.connect("totally_not_my_privateKeys.db")
-                cursor = conn.execute("SELECT COUNT(*) FROM keys")
-                count = cursor.fetchone()[0]
+                now = int(time.time())
+                # Total/valid/expired counts in a single scan
+                with self._db_lock:
+                    cursor = self._get_db().execute(
+                        "SELECT COUNT(*), "
+                        "COALESCE(SUM(CASE WHEN exp > ? THEN 1 ELSE 0 END), 0), "
+                        "COALESCE(SUM(CASE WHEN exp <= ? THEN 1 ELSE 0 END), 0) "
+                        "FROM keys",
+                        (now, now)
+                    )
+                    count, valid, expired = cursor.fetchone()
                 print(f"  Total keys: {count}")
-                
-                now = int(datetime.utcnow().timestamp())
-                cursor = conn.execute("SELECT COUNT(*) FROM keys WHERE exp > ?", (now,))
-                valid = cursor.fetchone()[0]
-                cursor = conn.execute("SELECT COUNT(*) FROM keys WHERE exp <= ?", (now,))
-                expired = cursor.fetchone()[0]
                 print(f"  Valid keys: {valid}")
                 print(f"  Expired keys: {expired}")
-                conn.close()
             except Exception as e:
                 print(f"  Error reading database: {e}")
 
@@ -305,28 +371,17 @@ def main():
     """Main function"""
     print(f"{Fore.CYAN}Starting Project 2 Gradebot Client...{Style.RESET_ALL}")
     
+    client = GradebotClient()
+
     # Check if server is likely running
     try:
-        response = requests.get("http://127.0.0.1:8080/.well-known/jwks.json", timeout=2)
+        client._fetch_jwks()
     except:
         print(f"{Fore.RED}⚠️  Warning: Server doesn't appear to be running on port 8080{Style.RESET_ALL}")
         print("Please start your server with: python -m flask --app jwks_server.app run --port 8080")
         print()
     
-    client = GradebotClient()
     client.run_tests()
 
 if __name__ == "__main__":
-    # Install required packages if not available
-    try:
-        import tabulate
-        import colorama
-    except ImportError:
-        print("Installing required packages...")
-        import subprocess
-        import sys
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "tabulate", "colorama"])
-        import tabulate
-        import colorama
-    
-    main()
\ No newline at end of file
+    main()
@@ -36,10 +36,7 @@ def print_rubric_table():
         columns = cursor.fetchall()
         conn.close()
         
-        expected_columns = ['kid', 'key', 'exp']
-        found_columns = [col[1] for col in columns]
-        
-        if all(col in found_columns for col in expected_columns):
+        if frozenset(("kid", "key", "exp")).issubset(col[1] for col in columns):
             results.append(("Database schema is correct", 15, "PASS"))
             total_points += 15
         else:
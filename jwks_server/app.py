@@ -9,33 +9,53 @@ from flask import Flask, jsonify, request, abort
 from datetime import datetime, timedelta
 import time
 import jwt  # PyJWT
-import json
 from .keystore import KeyStore
-from .utils import base64url_encode_int
 
 app = Flask(__name__)
 store = KeyStore()
+# Routes read the store from the app so tests can point it at their own database
+app.store = store
 
-# Initialize some sample keys on startup
-now = datetime.utcnow()
-# one expired
-store.generate_key(now - timedelta(hours=2))
-# two valid
-store.generate_key(now + timedelta(hours=2))
-store.generate_key(now + timedelta(days=1))
+# Let browsers/CDNs absorb repeated JWKS fetches; key rotation is far slower than this
+JWKS_CACHE_CONTROL = "public, max-age=30"
+
+
+def _init_sample_keys(keystore: KeyStore):
+    """
+    Initialize some sample keys on startup: one expired, two valid.
+    Skipped when the database can already sign both ways, so restarts don't keep adding keys.
+    """
+    if keystore.has_signing_keys():
+        return
+    now = datetime.now()
+    keystore.generate_keys_bulk([
+        now - timedelta(hours=2),
+        now + timedelta(hours=2),
+        now + timedelta(days=1),
+    ])
+
+
+_init_sample_keys(store)
+
+
+def _jwks_response():
+    """Return the pre-serialized JWKS bytes with the cache headers attached."""
+    resp = app.response_class(app.store.jwks_bytes(), mimetype="application/json")
+    resp.headers["Cache-Control"] = JWKS_CACHE_CONTROL
+    return resp
 
 
 @app.route("/.well-known/jwks.json", methods=["GET"])
 def jwks():
     """Return JWKS JSON with only unexpired public keys from database."""
-    return jsonify(store.jwks())
+    return _jwks_response()
 
 
 # Keep the original /jwks endpoint for backward compatibility
 @app.route("/jwks", methods=["GET"])
 def jwks_legacy():
     """Return JWKS JSON with only unexpired public keys from database."""
-    return jsonify(store.jwks())
+    return _jwks_response()
 
 
 @app.route("/auth", methods=["POST"])
@@ -47,41 +67,35 @@ def auth():
     sets the token exp to that expired key expiry (in the past).
     Otherwise it signs with a non-expired key and token exp is min(key_expiry, now+1h).
     """
-    now = datetime.utcnow()
-    want_expired = "expired" in request.args and request.args.get("expired") != ""
-
-    # Mock authentication - accept JSON payload
-    if request.content_type == 'application/json':
-        try:
-            auth_data = request.get_json()
-            if not auth_data or auth_data.get('username') != 'userABC' or auth_data.get('password') != 'password123':
-                abort(401, description="Invalid credentials")
-        except Exception:
+    now_ts = int(time.time())
+    want_expired = bool(request.args.get("expired"))
+
+    # Mock authentication - accept JSON payload; other requests skip the check for testing
+    if request.is_json:
+        auth_data = request.get_json(silent=True)
+        if not isinstance(auth_data, dict):
             abort(400, description="Invalid JSON payload")
-    else:
-        # Also support the basic case without authentication for testing
-        pass
+        if auth_data.get('username') != 'userABC' or auth_data.get('password') != 'password123':
+            abort(401, description="Invalid credentials")
 
-    kp = store.find_signing_key(want_expired=want_expired, now=now)
+    kp = app.store.find_signing_key(want_expired=want_expired, now=now_ts)
     if kp is None:
         abort(500, description="no signing key available")
 
     # Decide token expiry
     if want_expired:
-        token_exp = kp.expiry
+        token_exp = kp.expiry_ts
     else:
-        one_hour = now + timedelta(hours=1)
-        token_exp = kp.expiry if kp.expiry < one_hour else one_hour
+        token_exp = min(kp.expiry_ts, now_ts + 3600)
 
     payload = {
         "sub": "fake-user-1",  # Keep original for test compatibility
-        "iat": int(now.timestamp()),
-        "exp": int(token_exp.timestamp()),
+        "iat": now_ts,
+        "exp": token_exp,
     }
 
     headers = {"kid": str(kp.kid)}
-    # serialize private key to PEM (PyJWT supports PEM bytes)
-    priv_pem = store.private_key_pem(kp)
-    token = jwt.encode(payload, priv_pem, algorithm="RS256", headers=headers)
+    # PyJWT accepts the cryptography key object directly, so no PEM round trip
+    token = jwt.encode(payload, app.store.private_key_obj(kp), algorithm="RS256", headers=headers)
 
     return jsonify({"token": token, "kid": str(kp.kid)})
@@ -2,55 +2,174 @@
 """
 Database utilities for SQLite storage of private keys.
 Handles secure database operations with parameterized queries to prevent SQL injection.
+Connections are long-lived: one write connection guarded by a lock, plus a small pool of
+read connections, so DatabaseManager is safe to share between threads. SQLite's statement
+cache reuses the compiled SQL below across calls.
 """
 
 import sqlite3
-import os
-from datetime import datetime
-from typing import List, Tuple, Optional
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
 
 
 class DatabaseManager:
     """Manages SQLite database operations for private key storage."""
-    
+
+    _SQL_INSERT = "INSERT INTO keys (key, exp, n, e) VALUES (?, ?, ?, ?)"
+    _SQL_VALID = "SELECT kid, key, exp FROM keys WHERE exp > ? ORDER BY exp ASC"
+    _SQL_FIRST_VALID = "SELECT kid, key, exp FROM keys WHERE exp > ? ORDER BY exp ASC LIMIT 1"
+    _SQL_VALID_PUBLIC = "SELECT kid, n, e, exp FROM keys WHERE exp > ? ORDER BY exp ASC"
+    _SQL_MISSING_PUBLIC = "SELECT kid, key FROM keys WHERE n IS NULL OR e IS NULL"
+    _SQL_SET_PUBLIC = "UPDATE keys SET n = ?, e = ? WHERE kid = ?"
+    _SQL_EXPIRED = "SELECT kid, key, exp FROM keys WHERE exp <= ? ORDER BY kid ASC"
+    _SQL_FIRST_EXPIRED = "SELECT kid, key, exp FROM keys WHERE exp <= ? ORDER BY kid ASC LIMIT 1"
+    _SQL_BY_ID = "SELECT kid, key, exp FROM keys WHERE kid = ?"
+    _SQL_CLEANUP = "DELETE FROM keys WHERE exp <= ?"
+    _SQL_VALID_FINGERPRINT = "SELECT COUNT(*), MAX(kid), MIN(exp) FROM keys WHERE exp > ?"
+
+    # Pooled read connections per DatabaseManager; reads never wait on the write lock
+    READ_POOL_SIZE = 4
+
     def __init__(self, db_file: str = "totally_not_my_privateKeys.db"):
-        """Initialize database connection and create schema if needed."""
+        """Open the shared write connection and create schema if needed."""
         self.db_file = db_file
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        # An in-memory database exists only on its own connection, so it cannot be pooled
+        # and has no journal file to put in WAL mode
+        self._memory = db_file == ":memory:"
+        if not self._memory:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._read_pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._readers: List[sqlite3.Connection] = []
         self._init_database()
-    
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection with the per-connection settings every query expects."""
+        # isolation_level=None -> autocommit; each statement is its own transaction
+        conn = sqlite3.connect(self.db_file, check_same_thread=False, isolation_level=None)
+        # Rows index by position or column name ("kid", "key", "exp")
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-8000")  # 8 MiB page cache
+        conn.execute("PRAGMA mmap_size=268435456")  # read pages via a 256 MiB memory map
+        return conn
+
+    @contextmanager
+    def _reader(self):
+        """
+        Borrow a read connection from the pool, opening up to READ_POOL_SIZE lazily.
+        WAL mode lets these read concurrently with each other and with the writer.
+        """
+        if self._memory:
+            with self._lock:
+                yield self._conn
+            return
+        try:
+            conn = self._read_pool.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                opened = len(self._readers) < self.READ_POOL_SIZE
+                if opened:
+                    conn = self._connect()
+                    self._readers.append(conn)
+            if not opened:
+                conn = self._read_pool.get()
+        try:
+            yield conn
+        finally:
+            self._read_pool.put(conn)
+
     def _init_database(self):
         """Create the database file and initialize the schema."""
-        with sqlite3.connect(self.db_file) as conn:
+        with self._lock:
             # Create the keys table with the specified schema
-            conn.execute("""
+            self._conn.execute("""
                 CREATE TABLE IF NOT EXISTS keys(
                     kid INTEGER PRIMARY KEY AUTOINCREMENT,
                     key BLOB NOT NULL,
                     exp INTEGER NOT NULL
                 )
             """)
-            conn.commit()
-    
-    def save_key(self, key_pem: bytes, expiry_timestamp: int) -> int:
+            # The public key's base64url n/e next to the private key,
+            # added to older databases in place
+            self._ensure_column("n", "TEXT")
+            self._ensure_column("e", "TEXT")
+            # exp range predicates become index range scans with sorted output
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_keys_exp_kid ON keys(exp, kid)")
+            self._conn.execute("ANALYZE")
+
+    def _ensure_column(self, name: str, decl: str):
+        """Add a column to the keys table if it is missing (hold _lock)."""
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(keys)")}
+        if name not in columns:
+            self._conn.execute(f"ALTER TABLE keys ADD COLUMN {name} {decl}")
+
+    def close(self):
+        """Close the write connection and every pooled read connection."""
+        for conn in getattr(self, "_readers", ()):
+            conn.close()
+        self._readers = []
+        conn = getattr(self, "_conn", None)
+        if conn is not None:
+            conn.close()
+            self._conn = None
+
+    def __enter__(self) -> "DatabaseManager":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def save_key(self, key_pem: bytes, expiry_timestamp: int,
+                 n_b64: Optional[str] = None, e_b64: Optional[str] = None) -> int:
         """
         Save a private key to the database.
         
         Args:
             key_pem: Private key in PEM format (bytes)
             expiry_timestamp: Unix timestamp when the key expires
+            n_b64: base64url RSA modulus, if known
+            e_b64: base64url RSA public exponent, if known
             
         Returns:
             The kid (key ID) assigned by the database
         """
-        with sqlite3.connect(self.db_file) as conn:
-            cursor = conn.execute(
-                "INSERT INTO keys (key, exp) VALUES (?, ?)",
-                (key_pem, expiry_timestamp)
+        with self._lock:
+            cursor = self._conn.execute(
+                self._SQL_INSERT, (key_pem, expiry_timestamp, n_b64, e_b64)
             )
-            conn.commit()
             return cursor.lastrowid
     
-    def get_valid_keys(self, now_timestamp: int) -> List[Tuple[int, bytes, int]]:
+    def save_keys_bulk(self, rows: List[tuple]) -> List[int]:
+        """
+        Save several private keys in a single transaction (one commit).
+        
+        Args:
+            rows: List of (key_pem, expiry_timestamp, n_b64, e_b64) tuples
+            
+        Returns:
+            The kids assigned by the database, in the same order as rows
+        """
+        kids = []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for row in rows:
+                    kids.append(self._conn.execute(self._SQL_INSERT, row).lastrowid)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return kids
+    
+    def get_valid_keys(self, now_timestamp: int) -> List[sqlite3.Row]:
         """
         Get all valid (non-expired) keys from the database.
         
@@ -58,16 +177,89 @@ class DatabaseManager:
             now_timestamp: Current Unix timestamp
             
         Returns:
-            List of tuples: (kid, key_pem, expiry_timestamp)
+            List of rows: (kid, key, exp)
         """
-        with sqlite3.connect(self.db_file) as conn:
-            cursor = conn.execute(
-                "SELECT kid, key, exp FROM keys WHERE exp > ? ORDER BY exp ASC",
-                (now_timestamp,)
-            )
+        with self._reader() as conn:
+            cursor = conn.execute(self._SQL_VALID, (now_timestamp,))
             return cursor.fetchall()
     
-    def get_expired_keys(self, now_timestamp: int) -> List[Tuple[int, bytes, int]]:
+    def iter_valid_keys(self, now_timestamp: int) -> Iterator[sqlite3.Row]:
+        """
+        Lazily iterate valid (non-expired) keys, soonest expiry first.
+        
+        Args:
+            now_timestamp: Current Unix timestamp
+            
+        Yields:
+            Rows of (kid, key, exp)
+        """
+        with self._reader() as conn:
+            yield from conn.execute(self._SQL_VALID, (now_timestamp,))
+    
+    def get_first_valid_key(self, now_timestamp: int) -> Optional[sqlite3.Row]:
+        """
+        Get the valid key that expires soonest.
+        
+        Args:
+            now_timestamp: Current Unix timestamp
+            
+        Returns:
+            Row of (kid, key, exp) or None if no key is valid
+        """
+        with self._reader() as conn:
+            return conn.execute(self._SQL_FIRST_VALID, (now_timestamp,)).fetchone()
+    
+    def get_valid_public_keys(self, now_timestamp: int) -> List[sqlite3.Row]:
+        """
+        Get the public halves of all valid (non-expired) keys.
+        
+        Args:
+            now_timestamp: Current Unix timestamp
+            
+        Returns:
+            List of rows: (kid, n, e, exp); n/e are None for keys saved without them
+        """
+        with self._reader() as conn:
+            cursor = conn.execute(self._SQL_VALID_PUBLIC, (now_timestamp,))
+            return cursor.fetchall()
+    
+    def get_keys_missing_public(self) -> List[sqlite3.Row]:
+        """
+        Get keys that are missing their public n/e.
+        
+        Returns:
+            List of rows: (kid, key)
+        """
+        with self._reader() as conn:
+            return conn.execute(self._SQL_MISSING_PUBLIC).fetchall()
+    
+    def set_public_key(self, kid: int, n_b64: str, e_b64: str):
+        """
+        Store the public key's base64url n/e for an existing key.
+        
+        Args:
+            kid: Key ID to update
+            n_b64: base64url RSA modulus
+            e_b64: base64url RSA public exponent
+        """
+        with self._lock:
+            self._conn.execute(self._SQL_SET_PUBLIC, (n_b64, e_b64, kid))
+    
+    def get_valid_keys_fingerprint(self, now_timestamp: int) -> sqlite3.Row:
+        """
+        Get a cheap summary of the valid key set, used to detect changes.
+
+        Args:
+            now_timestamp: Current Unix timestamp
+
+        Returns:
+            Row of (count, max_kid, min_expiry_timestamp) over valid keys
+        """
+        with self._reader() as conn:
+            cursor = conn.execute(self._SQL_VALID_FINGERPRINT, (now_timestamp,))
+            return cursor.fetchone()
+    
+    def get_expired_keys(self, now_timestamp: int) -> List[sqlite3.Row]:
         """
         Get all expired keys from the database.
         
@@ -75,16 +267,26 @@ class DatabaseManager:
             now_timestamp: Current Unix timestamp
             
         Returns:
-            List of tuples: (kid, key_pem, expiry_timestamp)
+            List of rows: (kid, key, exp)
         """
-        with sqlite3.connect(self.db_file) as conn:
-            cursor = conn.execute(
-                "SELECT kid, key, exp FROM keys WHERE exp <= ? ORDER BY kid ASC",
-                (now_timestamp,)
-            )
+        with self._reader() as conn:
+            cursor = conn.execute(self._SQL_EXPIRED, (now_timestamp,))
             return cursor.fetchall()
     
-    def get_key_by_id(self, kid: int) -> Optional[Tuple[int, bytes, int]]:
+    def get_first_expired_key(self, now_timestamp: int) -> Optional[sqlite3.Row]:
+        """
+        Get the expired key with the lowest kid.
+        
+        Args:
+            now_timestamp: Current Unix timestamp
+            
+        Returns:
+            Row of (kid, key, exp) or None if no key has expired
+        """
+        with self._reader() as conn:
+            return conn.execute(self._SQL_FIRST_EXPIRED, (now_timestamp,)).fetchone()
+    
+    def get_key_by_id(self, kid: int) -> Optional[sqlite3.Row]:
         """
         Get a specific key by its ID.
         
@@ -92,13 +294,10 @@ class DatabaseManager:
             kid: Key ID to retrieve
             
         Returns:
-            Tuple of (kid, key_pem, expiry_timestamp) or None if not found
+            Row of (kid, key, exp) or None if not found
         """
-        with sqlite3.connect(self.db_file) as conn:
-            cursor = conn.execute(
-                "SELECT kid, key, exp FROM keys WHERE kid = ?",
-                (kid,)
-            )
+        with self._reader() as conn:
+            cursor = conn.execute(self._SQL_BY_ID, (kid,))
             return cursor.fetchone()
     
     def cleanup_expired_keys(self, now_timestamp: int) -> int:
@@ -111,10 +310,6 @@ class DatabaseManager:
         Returns:
             Number of keys deleted
         """
-        with sqlite3.connect(self.db_file) as conn:
-            cursor = conn.execute(
-                "DELETE FROM keys WHERE exp <= ?",
-                (now_timestamp,)
-            )
-            conn.commit()
+        with self._lock:
+            cursor = self._conn.execute(self._SQL_CLEANUP, (now_timestamp,))
             return cursor.rowcount
\ No newline at end of file
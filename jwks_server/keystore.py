@@ -4,131 +4,273 @@ KeyStore: SQLite-backed RSA key generation and retrieval.
 Each key has:
  - kid: integer (database primary key)
  - private_key: cryptography RSA private key (serialized to PEM in DB)
- - expiry: datetime (stored as unix timestamp in DB)
+ - expiry_ts: unix timestamp, as stored in the DB (KeyPair.expiry gives it as a datetime)
+Naive datetimes are local time (datetime.now(), not utcnow()), so their .timestamp() shares
+the epoch basis of time.time(), which is used whenever no time is given.
 """
 
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
+import sqlite3
 import threading
-from typing import List, Optional
+import time
+from typing import List, Optional, Tuple, Union
+import orjson
 from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.hazmat.primitives import serialization
 
-from .utils import base64url_encode_int
+from .utils import base64url_encode_bytes, base64url_encode_int
 from .database import DatabaseManager
 
 
+# Fields shared by every JWK this server publishes
+_JWK_TEMPLATE = {"kty": "RSA", "use": "sig", "alg": "RS256"}
+
+
+def _timestamp(now: Union[datetime, int, None]) -> int:
+    """Unix timestamp of the given datetime or timestamp, or of now read from time.time()."""
+    if now is None:
+        return int(time.time())
+    if isinstance(now, int):
+        return now
+    return int(now.timestamp())
+
+
+def _public_parts(priv: rsa.RSAPrivateKey) -> Tuple[str, str]:
+    """Return (base64url n, base64url e) for a private key."""
+    pub = priv.public_key()
+    numbers = pub.public_numbers()
+    # The modulus fills exactly key_size bits and is unique per key, so it is encoded
+    # straight from its fixed-width bytes rather than through the int encoder's cache
+    n_bytes = numbers.n.to_bytes((pub.key_size + 7) // 8, "big")
+    return base64url_encode_bytes(n_bytes), base64url_encode_int(numbers.e)
+
+
+def _generate_key_material() -> Tuple[bytes, str, str]:
+    """
+    Generate a 2048-bit RSA key and return (PKCS8 private PEM, n, e)
+    (picklable for worker processes).
+    """
+    priv = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    priv_pem = priv.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+    return (priv_pem, *_public_parts(priv))
+
+
 @dataclass
 class KeyPair:
-    kid: int  # Changed from str to int to match database schema
+    __slots__ = ("kid", "private_key", "expiry_ts", "pem")
+
+    kid: int
     private_key: rsa.RSAPrivateKey
-    expiry: datetime
+    expiry_ts: int  # unix timestamp (matches the DB exp column)
+    pem: bytes  # PKCS8 PEM as stored in the database
+
+    @property
+    def expiry(self) -> datetime:
+        """Expiry as a naive local datetime, built only when asked for."""
+        return datetime.fromtimestamp(self.expiry_ts)
 
 
 class KeyStore:
+    # Parsed private keys kept in memory (least recently used are evicted)
+    PRIVATE_KEY_CACHE_SIZE = 64
+
     def __init__(self, db_file: str = "totally_not_my_privateKeys.db"):
-        self._lock = threading.RLock()
+        # Guards key inserts only; reads rely on DatabaseManager's own locking and
+        # the memoized JWKS state is replaced by whole-object assignment
+        self._lock = threading.Lock()
         self._db = DatabaseManager(db_file)
+        # (valid-key fingerprint, JWKS dict, JWKS JSON bytes) from the last jwks() build
+        self._jwks_cache: Optional[Tuple[tuple, dict, bytes]] = None
+        # kid -> (PEM it was parsed from, RSAPrivateKey); PEM is compared so a reused kid re-parses
+        self._priv_cache: "OrderedDict[int, Tuple[bytes, rsa.RSAPrivateKey]]" = OrderedDict()
+        self._priv_cache_lock = threading.Lock()
+        self._backfill_public_keys()
+
+    def close(self):
+        """Close the underlying database connections."""
+        self._db.close()
+
+    def __enter__(self) -> "KeyStore":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _backfill_public_keys(self):
+        """Store n/e for keys saved before those columns existed."""
+        for row in self._db.get_keys_missing_public():
+            try:
+                priv = serialization.load_pem_private_key(row["key"], password=None)
+            except ValueError:
+                continue  # not a usable private key; jwks() leaves it out
+            self._db.set_public_key(row["kid"], *_public_parts(priv))
+
+    def _public_fields(self, row: sqlite3.Row) -> Optional[Tuple[str, str]]:
+        """
+        Return a (kid, n, e, exp) row's n/e, deriving them if the row was saved without.
+        Returns None if the key is gone or its stored PEM is not a usable private key.
+        """
+        if row["n"] is not None and row["e"] is not None:
+            return row["n"], row["e"]
+        # Saved by code that predates the public columns: derive them from the stored key
+        key_row = self._db.get_key_by_id(row["kid"])
+        if key_row is None:
+            return None  # deleted since the valid keys were read
+        try:
+            return _public_parts(self._load_key_from_row(key_row).private_key)
+        except ValueError:
+            return None
 
     def generate_key(self, expiry: datetime) -> KeyPair:
         """Generate a 2048-bit RSA key with the given expiry and save to database."""
+        # Key generation and serialization happen outside the lock: OpenSSL keygen is
+        # thread-safe, so concurrent callers only serialize on the database insert.
+        # Generate the private key
+        priv = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        
+        # Serialize to PEM format for database storage
+        key_pem = priv.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        )
+        public_parts = _public_parts(priv)
+        expiry_ts = int(expiry.timestamp())
+        
+        with self._lock:
+            # Save to database (with the public parts for jwks()) and get the assigned kid
+            kid = self._db.save_key(key_pem, expiry_ts, *public_parts)
+        
+        # Return KeyPair object
+        return KeyPair(kid=kid, private_key=priv, expiry_ts=expiry_ts, pem=key_pem)
+
+    def generate_keys_bulk(self, expiries: List[datetime]) -> List[int]:
+        """
+        Generate one key per expiry, running RSA generation in parallel worker processes,
+        and save them all to the database in a single transaction.
+        Returns the new kids in input order; the keys are parsed only when later loaded.
+        """
+        if len(expiries) > 1:
+            with ProcessPoolExecutor(max_workers=len(expiries)) as pool:
+                futures = [pool.submit(_generate_key_material) for _ in expiries]
+                materials = [f.result() for f in futures]
+        else:
+            materials = [_generate_key_material() for _ in expiries]
+
         with self._lock:
-            # Generate the private key
-            priv = rsa.generate_private_key(public_exponent=65537, key_size=2048)
-            
-            # Serialize to PEM format for database storage
-            key_pem = priv.private_bytes(
-                encoding=serialization.Encoding.PEM,
-                format=serialization.PrivateFormat.PKCS8,
-                encryption_algorithm=serialization.NoEncryption(),
+            return self._db.save_keys_bulk(
+                [(priv_pem, int(expiry.timestamp()), *public_parts)
+                 for (priv_pem, *public_parts), expiry in zip(materials, expiries)]
             )
-            
-            # Save to database and get the assigned kid
-            kid = self._db.save_key(key_pem, int(expiry.timestamp()))
-            
-            # Return KeyPair object
-            return KeyPair(kid=kid, private_key=priv, expiry=expiry)
 
     def _load_key_from_db(self, kid: int, key_pem: bytes, expiry_timestamp: int) -> KeyPair:
-        """Load a private key from PEM bytes and create KeyPair object."""
-        private_key = serialization.load_pem_private_key(
-            key_pem, password=None
-        )
-        expiry = datetime.fromtimestamp(expiry_timestamp)
-        return KeyPair(kid=kid, private_key=private_key, expiry=expiry)
+        """Build a KeyPair from PEM bytes, parsing each key at most once while it stays cached."""
+        private_key = None
+        with self._priv_cache_lock:
+            cached = self._priv_cache.get(kid)
+            if cached is not None and cached[0] == key_pem:
+                self._priv_cache.move_to_end(kid)
+                private_key = cached[1]
+        if private_key is None:
+            private_key = serialization.load_pem_private_key(
+                key_pem, password=None
+            )
+            with self._priv_cache_lock:
+                self._priv_cache[kid] = (key_pem, private_key)
+                self._priv_cache.move_to_end(kid)
+                if len(self._priv_cache) > self.PRIVATE_KEY_CACHE_SIZE:
+                    self._priv_cache.popitem(last=False)
+        return KeyPair(kid=kid, private_key=private_key, expiry_ts=expiry_timestamp, pem=key_pem)
+
+    def _load_key_from_row(self, row: sqlite3.Row) -> KeyPair:
+        """Create a KeyPair straight from a database row."""
+        return self._load_key_from_db(row["kid"], row["key"], row["exp"])
 
     def get_unexpired(self, now: datetime = None) -> List[KeyPair]:
         """Return list of KeyPair with expiry > now."""
-        now = now or datetime.utcnow()
-        with self._lock:
-            keys_data = self._db.get_valid_keys(int(now.timestamp()))
-            return [self._load_key_from_db(kid, key_pem, exp) 
-                   for kid, key_pem, exp in keys_data]
+        return [self._load_key_from_row(row) for row in self._db.iter_valid_keys(_timestamp(now))]
 
     def get_expired(self, now: datetime = None) -> List[KeyPair]:
         """Return list of KeyPair with expiry <= now."""
-        now = now or datetime.utcnow()
-        with self._lock:
-            keys_data = self._db.get_expired_keys(int(now.timestamp()))
-            return [self._load_key_from_db(kid, key_pem, exp) 
-                   for kid, key_pem, exp in keys_data]
+        keys_data = self._db.get_expired_keys(_timestamp(now))
+        return [self._load_key_from_row(row) for row in keys_data]
 
-    def find_signing_key(self, want_expired: bool = False, now: datetime = None) -> Optional[KeyPair]:
+    def has_signing_keys(self, now: datetime = None) -> bool:
+        """Return True if both an unexpired and an expired key are stored (nothing is parsed)."""
+        now_ts = _timestamp(now)
+        return (self._db.get_first_valid_key(now_ts) is not None
+                and self._db.get_first_expired_key(now_ts) is not None)
+
+    def find_signing_key(self, want_expired: bool = False,
+                         now: Union[datetime, int] = None) -> Optional[KeyPair]:
         """
         If want_expired==True, return the first expired key (deterministic by kid order).
         Otherwise return the soonest-expiring unexpired key.
+        now may be a datetime or a unix timestamp (as /auth passes it).
         """
-        now = now or datetime.utcnow()
-        with self._lock:
-            if want_expired:
-                expired_data = self._db.get_expired_keys(int(now.timestamp()))
-                if expired_data:
-                    kid, key_pem, exp = expired_data[0]  # First expired key
-                    return self._load_key_from_db(kid, key_pem, exp)
-                return None
-            
-            valid_data = self._db.get_valid_keys(int(now.timestamp()))
-            if valid_data:
-                kid, key_pem, exp = valid_data[0]  # First valid key (ordered by exp ASC)
-                return self._load_key_from_db(kid, key_pem, exp)
-            return None
+        now_ts = _timestamp(now)
+        # Only the one matching key is fetched and parsed
+        if want_expired:
+            row = self._db.get_first_expired_key(now_ts)
+        else:
+            row = self._db.get_first_valid_key(now_ts)
+        if row is not None:
+            return self._load_key_from_row(row)
+        return None
 
     def jwks(self, now: datetime = None) -> dict:
         """
         Return a JWKS dict (per RFC) containing only unexpired public keys.
         Each key contains kty, kid, use, alg, n, e, and a custom 'exp' (unix) to help tests.
+        The result is memoized until the set of valid keys changes (insert or expiry), and
+        the same dict is returned to every caller until then: treat it as read-only.
         """
-        now = now or datetime.utcnow()
-        out = {"keys": []}
+        return self._jwks_entry(now)[1]
+
+    def jwks_bytes(self, now: datetime = None) -> bytes:
+        """Return the JWKS as JSON bytes, serialized once per memoized jwks() build."""
+        return self._jwks_entry(now)[2]
+
+    def _jwks_entry(self, now: datetime = None) -> Tuple[tuple, dict, bytes]:
+        now_ts = _timestamp(now)
         
-        with self._lock:
-            keys_data = self._db.get_valid_keys(int(now.timestamp()))
-            
-            for kid, key_pem, exp in keys_data:
-                # Load the private key and extract public key
-                private_key = serialization.load_pem_private_key(key_pem, password=None)
-                pub = private_key.public_key()
-                numbers = pub.public_numbers()
-                
-                # Encode RSA public key components
-                n_b64 = base64url_encode_int(numbers.n)
-                e_b64 = base64url_encode_int(numbers.e)
-                
-                out["keys"].append({
-                    "kty": "RSA",
-                    "use": "sig",
-                    "alg": "RS256",
-                    "kid": str(kid),  # Convert to string for JSON compatibility
-                    "n": n_b64,
-                    "e": e_b64,
-                    "exp": exp,  # Unix timestamp
-                })
-        return out
+        # The database fingerprint changes on any insert, delete or expiry of a valid key,
+        # whichever connection or process made it
+        fingerprint = tuple(self._db.get_valid_keys_fingerprint(now_ts))
+        cached = self._jwks_cache
+        if cached is not None and cached[0] == fingerprint:
+            return cached
+
+        # The database is the source of truth: on a miss, build the JWKs straight from the
+        # valid keys' public fields (ordered by expiry)
+        keys = []
+        for row in self._db.get_valid_public_keys(now_ts):
+            fields = self._public_fields(row)
+            if fields is None:
+                continue  # one unusable row must not take down the whole JWKS
+            n_b64, e_b64 = fields
+            keys.append({
+                **_JWK_TEMPLATE,
+                "kid": str(row["kid"]),  # JWK kids are strings
+                "n": n_b64,
+                "e": e_b64,
+                "exp": row["exp"],  # Unix timestamp
+            })
+        out = {"keys": keys}
+        self._jwks_cache = (fingerprint, out, orjson.dumps(out))
+        return self._jwks_cache
+
+    def private_key_obj(self, kp: KeyPair) -> rsa.RSAPrivateKey:
+        """Return the already-loaded private key object for PyJWT signing."""
+        return kp.private_key
 
     def private_key_pem(self, kp: KeyPair) -> bytes:
-        """Return private key in PEM format for PyJWT signing."""
-        return kp.private_key.private_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PrivateFormat.PKCS8,
-            encryption_algorithm=serialization.NoEncryption(),
-        )
\ No newline at end of file
+        """Return private key in PEM format (the PKCS8 PEM kept from generation or load)."""
+        return kp.pem
\ No newline at end of file
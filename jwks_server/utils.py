@@ -4,14 +4,53 @@ Small helpers.
 """
 
 import base64
+import binascii
+from functools import lru_cache
+
+# base64url of the standard RSA public exponent 65537
+_E_AQAB = "AQAB"
+# base64url -> standard alphabet, and the padding each length remainder needs
+_URL_TO_STD = bytes.maketrans(b"-_", b"+/")
+_PAD = (b"", b"===", b"==", b"=")
+
+
+def base64url_encode_bytes(data: bytes) -> str:
+    """
+    Encode raw bytes as base64url without padding.
+    """
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
 
 
 def base64url_encode_int(value: int) -> str:
     """
     Encode a big integer (like RSA n or e) as base64url without padding (RFC7517 style).
     """
+    # fast paths for the public exponent every key uses and for zero
+    if value == 65537:
+        return _E_AQAB
+    if value == 0:
+        return "AA"
+    return _encode_int_cached(value)
+
+
+@lru_cache(maxsize=64)
+def _encode_int_cached(value: int) -> str:
     # convert integer to big-endian bytes
-    length = (value.bit_length() + 7) // 8
-    b = value.to_bytes(length, "big") if length > 0 else b'\x00'
-    s = base64.urlsafe_b64encode(b).rstrip(b"=").decode("ascii")
-    return s
+    return base64url_encode_bytes(value.to_bytes((value.bit_length() + 7) // 8, "big"))
+
+
+def base64url_decode(value: str) -> bytes:
+    """
+    Decode an unpadded base64url string (like a JWT segment) to raw bytes.
+    Inverse of base64url_encode_bytes.
+    """
+    b = value.encode("ascii").translate(_URL_TO_STD)
+    return binascii.a2b_base64(b + _PAD[len(b) & 3])
+
+
+def base64url_decode_int(value: str) -> int:
+    """
+    Decode an unpadded base64url string (like a JWK n or e) to an integer.
+    Inverse of base64url_encode_int.
+    """
+    return int.from_bytes(base64url_decode(value), "big")
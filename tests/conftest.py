@@ -3,35 +3,51 @@ import pytest
 import tempfile
 import os
 from jwks_server.app import app as flask_app
-from jwks_server.keystore import KeyStore
-from datetime import datetime, timedelta
+from jwks_server.keystore import KeyStore, _generate_key_material
+from jwks_server.database import DatabaseManager
+import time
 
-@pytest.fixture
-def app():
-    """Create application for testing with temporary database."""
-    # Create a temporary database file for testing
-    db_fd, db_path = tempfile.mkstemp()
+@pytest.fixture(scope="session")
+def rsa_key_material():
+    """RSA keys generated once per test session, as (private PEM, n, e)."""
+    return [_generate_key_material() for _ in range(3)]
+
+@pytest.fixture(scope="module")
+def app(rsa_key_material):
+    """Create application for testing with temporary database (shared by a test module)."""
+    # Create a temporary database file for testing (its WAL side files land alongside)
+    tmp_dir = tempfile.TemporaryDirectory()
+    db_path = os.path.join(tmp_dir.name, "keys.db")
     
     # Configure app for testing
     flask_app.config['TESTING'] = True
     flask_app.config['DATABASE'] = db_path
     
+    # Initialize test keys from the session's pre-generated material
+    now = int(time.time())
+    expiries = [
+        now - 2 * 3600,   # expired
+        now + 2 * 3600,   # valid
+        now + 24 * 3600,  # valid
+    ]
+    with DatabaseManager(db_path) as db:
+        db.save_keys_bulk([
+            (priv_pem, expiry, n, e)
+            for (priv_pem, n, e), expiry in zip(rsa_key_material, expiries)
+        ])
+    
     # Create new KeyStore with temporary database
+    original_store = flask_app.store
     flask_app.store = KeyStore(db_file=db_path)
     
-    # Initialize test keys
-    now = datetime.utcnow()
-    flask_app.store.generate_key(now - timedelta(hours=2))  # expired
-    flask_app.store.generate_key(now + timedelta(hours=2))  # valid
-    flask_app.store.generate_key(now + timedelta(days=1))   # valid
-    
     yield flask_app
     
-    # Cleanup
-    os.close(db_fd)
-    os.unlink(db_path)
+    # Cleanup (close the database first so the directory can be removed on Windows)
+    flask_app.store.close()
+    flask_app.store = original_store
+    tmp_dir.cleanup()
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def client(app):
     """Flask test client using the app that's configured with a test database."""
     return app.test_client()
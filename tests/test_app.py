@@ -1,65 +1,70 @@
 # tests/test_app.py
 import json
-import base64
+import functools
 import tempfile
 import os
+import threading
 from datetime import datetime, timedelta
 import time
 
 import jwt
+import orjson
 from jwks_server import keystore
 from jwks_server.keystore import KeyStore
-from jwks_server.app import app
-from jwks_server.utils import base64url_encode_int
+from jwks_server.app import app, _init_sample_keys
+from jwks_server.utils import (
+    base64url_decode, base64url_decode_int, base64url_encode_bytes, base64url_encode_int,
+)
 from jwks_server.database import DatabaseManager
 from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.hazmat.primitives import serialization
 import pytest
 
-def b64url_decode(s: str) -> bytes:
-    rem = len(s) % 4
-    if rem:
-        s += "=" * (4 - rem)
-    return base64.urlsafe_b64decode(s.encode("ascii"))
+# Every published JWK carries these values, plus these per-key fields
+JWK_CONSTANT_FIELDS = {"kty": "RSA", "use": "sig", "alg": "RS256"}
+JWK_REQUIRED_FIELDS = frozenset(("kid", "n", "e", "exp"))
 
 def fetch_jwks(client):
     rv = client.get("/.well-known/jwks.json")
     assert rv.status_code == 200
     return rv.get_json()
 
+def fetch_jwks_by_kid(client):
+    return {k["kid"]: k for k in fetch_jwks(client)["keys"]}
+
 def fetch_jwks_legacy(client):
     rv = client.get("/jwks")
     assert rv.status_code == 200
     return rv.get_json()
 
-def jwt_payload(token):
-    parts = token.split(".")
-    assert len(parts) >= 2
-    payload_bytes = b64url_decode(parts[1])
-    return json.loads(payload_bytes.decode("utf-8"))
+def jwt_parts(token):
+    """Split a JWT once and return its decoded (header, payload)."""
+    hdr, payload, _ = token.split(".", 2)
+    return orjson.loads(base64url_decode(hdr)), orjson.loads(base64url_decode(payload))
 
-def jwt_header(token):
-    parts = token.split(".")
-    hdr_bytes = b64url_decode(parts[0])
-    return json.loads(hdr_bytes.decode("utf-8"))
+@functools.lru_cache(maxsize=16)
+def _public_key_from_b64(n_b64, e_b64):
+    # Same session keys recur across tests; build (and validate) each RSAPublicKey once
+    pubnum = rsa.RSAPublicNumbers(base64url_decode_int(e_b64), base64url_decode_int(n_b64))
+    return pubnum.public_key()
 
 def build_public_key_from_jwk(j):
     # j has "n" and "e" base64url
-    n = int.from_bytes(base64.urlsafe_b64decode(j["n"] + "=="), "big")
-    e = int.from_bytes(base64.urlsafe_b64decode(j["e"] + "=="), "big")
-    pubnum = rsa.RSAPublicNumbers(e, n)
-    pubkey = pubnum.public_key()
-    return pubkey
+    return _public_key_from_b64(j["n"], j["e"])
 
 # JWKS Tests
 def test_jwks_only_unexpired(client):
     jwks = fetch_jwks(client)
     assert "keys" in jwks
     assert len(jwks["keys"]) > 0
-    now = int(datetime.utcnow().timestamp())
+    now = int(time.time())
     for k in jwks["keys"]:
         assert k["exp"] > now  # custom 'exp' field included
 
+def test_jwks_cache_control_header(client):
+    rv = client.get("/.well-known/jwks.json")
+    assert rv.headers["Cache-Control"] == "public, max-age=30"
+
 def test_jwks_legacy_endpoint(client):
     jwks = fetch_jwks_legacy(client)
     assert "keys" in jwks
@@ -68,228 +73,379 @@ def test_jwks_legacy_endpoint(client):
 def test_jwks_structure(client):
     jwks = fetch_jwks(client)
     for key in jwks["keys"]:
-        assert "kty" in key and key["kty"] == "RSA"
-        assert "use" in key and key["use"] == "sig"
-        assert "alg" in key and key["alg"] == "RS256"
-        assert "kid" in key
-        assert "n" in key
-        assert "e" in key
-        assert "exp" in key
+        assert JWK_CONSTANT_FIELDS.items() <= key.items()
+        assert JWK_REQUIRED_FIELDS <= key.keys()
 
 # Auth Tests
 def test_auth_returns_valid_nonexpired_jwt(client):
-    # POST /auth
-    rv = client.post("/auth")
-    assert rv.status_code == 200
-    body = rv.get_json()
-    assert "token" in body
-    token = body["token"]
+    # Both requests run inside one client context
+    with client:
+        # POST /auth
+        rv = client.post("/auth")
+        assert rv.status_code == 200
+        body = rv.get_json()
+        assert "token" in body
+        token = body["token"]
 
-    # header should contain kid
-    hdr = jwt_header(token)
-    kid = hdr.get("kid")
-    assert kid is not None
+        # header should contain kid
+        hdr, _ = jwt_parts(token)
+        kid = hdr.get("kid")
+        assert kid is not None
 
-    # jwks should contain this kid
-    jwks = fetch_jwks(client)
-    found = False
-    for k in jwks["keys"]:
-        if k["kid"] == kid:
-            found = True
-            pub = build_public_key_from_jwk(k)
-            # verify signature with PyJWT
-            pub_pem = pub.public_bytes(
-                encoding=serialization.Encoding.PEM,
-                format=serialization.PublicFormat.SubjectPublicKeyInfo
-            )
-            decoded = jwt.decode(token, pub_pem, algorithms=["RS256"])
-            assert decoded["sub"] == "fake-user-1"
-            break
-    assert found, "kid from token not present in jwks"
+        # jwks should contain this kid
+        k = fetch_jwks_by_kid(client).get(kid)
+    assert k is not None, "kid from token not present in jwks"
+    pub = build_public_key_from_jwk(k)
+    # verify signature with PyJWT; a key object skips its PEM parsing
+    decoded = jwt.decode(token, pub, algorithms=["RS256"])
+    assert decoded["sub"] == "fake-user-1"
 
 def test_auth_expired_param_signs_with_expired_key_not_in_jwks(client):
     rv = client.post("/auth?expired=1")
     assert rv.status_code == 200
     body = rv.get_json()
     token = body["token"]
-    hdr = jwt_header(token)
+    hdr, payload = jwt_parts(token)
     kid = hdr.get("kid")
     # jwks should not have this kid (expired keys are not in jwks)
-    jwks = fetch_jwks(client)
-    assert all(k["kid"] != kid for k in jwks["keys"])
+    assert kid not in fetch_jwks_by_kid(client)
 
     # payload exp should be in the past
-    payload = jwt_payload(token)
-    assert payload["exp"] < int(datetime.utcnow().timestamp())
-
-def test_auth_json_payload_valid_credentials(client):
-    """Test JSON authentication with valid credentials"""
-    payload = {"username": "userABC", "password": "password123"}
-    rv = client.post("/auth", json=payload, content_type='application/json')
-    assert rv.status_code == 200
-    body = rv.get_json()
-    assert "token" in body
-
-def test_auth_json_payload_invalid_credentials(client):
-    """Test JSON authentication with invalid credentials"""
-    payload = {"username": "wrong", "password": "wrong"}
-    rv = client.post("/auth", json=payload, content_type='application/json')
-    assert rv.status_code == 401
+    assert payload["exp"] < int(time.time())
 
-def test_auth_malformed_json(client):
-    """Test auth endpoint with malformed JSON"""
-    rv = client.post("/auth", data="invalid json", content_type='application/json')
-    assert rv.status_code == 400
+@pytest.mark.parametrize("payload,status", [
+    ({"username": "userABC", "password": "password123"}, 200),  # valid credentials
+    ({"username": "wrong", "password": "wrong"}, 401),          # invalid credentials
+    ("invalid json", 400),                                      # malformed JSON
+], ids=["valid_credentials", "invalid_credentials", "malformed_json"])
+def test_auth_json_payload(client, payload, status):
+    """Test JSON authentication outcomes"""
+    body = {"json": payload} if isinstance(payload, dict) else {"data": payload}
+    rv = client.post("/auth", content_type='application/json', **body)
+    assert rv.status_code == status
+    if status == 200:
+        assert "token" in rv.get_json()
 
 def test_auth_no_signing_key_available(app, client):
     """Test auth when no signing keys are available"""
-    # Clear all keys from database
-    with app.app_context():
-        app.store._db._init_database()  # Reset database
-    
-    rv = client.post("/auth")
+    # Swap in an empty store, restoring the module-scoped app's seeded one afterwards
+    seeded = app.store
+    app.store = KeyStore(":memory:")
+    try:
+        rv = client.post("/auth")
+    finally:
+        app.store = seeded
     assert rv.status_code == 500
 
+def test_init_sample_keys_skips_seeded_database(rsa_key_material):
+    """Startup seeding leaves a database that can already sign both ways alone"""
+    now = int(time.time())
+    store = KeyStore(":memory:")
+    store._db.save_keys_bulk([
+        (priv_pem, exp, n, e)
+        for (priv_pem, n, e), exp in zip(rsa_key_material, [now - 3600, now + 3600])
+    ])
+    
+    _init_sample_keys(store)
+    assert len(store._db.get_valid_keys(0)) == 2
+
+@pytest.mark.skipif(not hasattr(time, "tzset"), reason="needs time.tzset to switch timezones")
+def test_sample_keys_share_request_clock_outside_utc(monkeypatch):
+    """Seeded expiries and /auth agree on the clock when the host is not on UTC"""
+    monkeypatch.setenv("TZ", "America/Chicago")
+    time.tzset()
+    try:
+        store = KeyStore(":memory:")
+        _init_sample_keys(store)
+        monkeypatch.setattr(app, "store", store)
+        client = app.test_client()
+        assert client.post("/auth?expired=1").status_code == 200
+        assert len(client.get("/.well-known/jwks.json").get_json()["keys"]) == 2
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
 # Database Tests
 def test_database_operations():
     """Test database operations directly"""
-    # Create temporary database
-    db_fd, db_path = tempfile.mkstemp()
+    now = int(time.time())
     
-    try:
-        db = DatabaseManager(db_path)
-        
-        # Test key saving
+    with DatabaseManager(":memory:") as db:
+        # Test key saving: one valid and one expired key in a single transaction
         test_key = b"test_key_pem_data"
-        exp_time = int(datetime.utcnow().timestamp()) + 3600
+        exp_time = now + 3600
         
-        kid = db.save_key(test_key, exp_time)
+        kid, expired_kid = db.save_keys_bulk([
+            (test_key, exp_time, None, None),
+            (b"expired_key_pem_data", exp_time - 7200, None, None),
+        ])
         assert kid is not None
+        assert expired_kid != kid
         
         # Test key retrieval
-        valid_keys = db.get_valid_keys(int(datetime.utcnow().timestamp()))
+        valid_keys = db.get_valid_keys(now)
         assert len(valid_keys) == 1
         assert valid_keys[0][0] == kid
         assert valid_keys[0][1] == test_key
         
         # Test expired keys
-        expired_keys = db.get_expired_keys(int(datetime.utcnow().timestamp()) + 7200)
-        assert len(expired_keys) == 1
+        expired_keys = db.get_expired_keys(now)
+        assert [row[0] for row in expired_keys] == [expired_kid]
+        expired_keys = db.get_expired_keys(now + 7200)
+        assert len(expired_keys) == 2
         
         # Test get by ID
         key_data = db.get_key_by_id(kid)
         assert key_data is not None
         assert key_data[1] == test_key
-        
-    finally:
-        os.close(db_fd)
-        os.unlink(db_path)
+
+def test_database_concurrent_reads():
+    """Reads from many threads share the bounded read-connection pool"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "keys.db")
+        with DatabaseManager(db_path) as db:
+            exp_time = int(time.time()) + 3600
+            kid = db.save_key(b"test_key_pem_data", exp_time)
+            results = []
+            
+            def read():
+                for _ in range(20):
+                    results.append([row[0] for row in db.get_valid_keys(exp_time - 1)])
+            
+            threads = [threading.Thread(target=read) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            
+            assert results == [[kid]] * 160
+            assert len(db._readers) <= DatabaseManager.READ_POOL_SIZE
 
 # KeyStore Tests
-def test_keystore_operations():
+def test_keystore_operations(rsa_key_material):
     """Test KeyStore operations"""
-    # Create temporary database
-    db_fd, db_path = tempfile.mkstemp()
+    store = KeyStore(":memory:")
+    now = datetime.now()
+    now_ts = int(now.timestamp())
+    # Seed the session's keys directly; test_keystore_generate_key covers keygen
+    (valid_pem, *valid_public), (expired_pem, *expired_public) = rsa_key_material[:2]
+    valid_kid = store._db.save_key(valid_pem, now_ts + 3600, *valid_public)
+    expired_kid = store._db.save_key(expired_pem, now_ts - 3600, *expired_public)
     
-    try:
-        store = KeyStore(db_path)
-        now = datetime.utcnow()
-        
-        # Test key generation
-        valid_key = store.generate_key(now + timedelta(hours=1))
-        expired_key = store.generate_key(now - timedelta(hours=1))
-        
-        assert valid_key.kid is not None
-        assert expired_key.kid is not None
-        
-        # Test get unexpired
-        unexpired = store.get_unexpired(now)
-        assert len(unexpired) == 1
-        assert unexpired[0].kid == valid_key.kid
-        
-        # Test get expired
-        expired = store.get_expired(now)
-        assert len(expired) == 1
-        assert expired[0].kid == expired_key.kid
-        
-        # Test find signing key
-        signing_key = store.find_signing_key(want_expired=False, now=now)
-        assert signing_key is not None
-        assert signing_key.kid == valid_key.kid
-        
-        expired_signing_key = store.find_signing_key(want_expired=True, now=now)
-        assert expired_signing_key is not None
-        assert expired_signing_key.kid == expired_key.kid
-        
-        # Test JWKS generation
-        jwks = store.jwks(now)
-        assert "keys" in jwks
-        assert len(jwks["keys"]) == 1
-        
-        # Test private key PEM
-        pem = store.private_key_pem(valid_key)
-        assert b"BEGIN PRIVATE KEY" in pem
+    # Test get unexpired
+    unexpired = store.get_unexpired(now)
+    assert len(unexpired) == 1
+    assert unexpired[0].kid == valid_kid
+    
+    # Test get expired
+    expired = store.get_expired(now)
+    assert len(expired) == 1
+    assert expired[0].kid == expired_kid
+    
+    # Test find signing key
+    signing_key = store.find_signing_key(want_expired=False, now=now)
+    assert signing_key is not None
+    assert signing_key.kid == valid_kid
+    
+    expired_signing_key = store.find_signing_key(want_expired=True, now=now)
+    assert expired_signing_key is not None
+    assert expired_signing_key.kid == expired_kid
+    
+    # Test JWKS generation
+    jwks = store.jwks(now)
+    assert "keys" in jwks
+    assert len(jwks["keys"]) == 1
+    
+    # Test private key PEM
+    pem = store.private_key_pem(signing_key)
+    assert pem == valid_pem
+
+def test_keystore_generate_key():
+    """generate_key makes a fresh RSA key and stores it with its public parts"""
+    store = KeyStore(":memory:")
+    now = datetime.now()
+    kp = store.generate_key(now + timedelta(hours=1))
+    
+    assert kp.private_key.key_size == 2048
+    loaded = serialization.load_pem_private_key(store.private_key_pem(kp), password=None)
+    assert loaded.private_numbers() == kp.private_key.private_numbers()
+    
+    row = store._db.get_valid_public_keys(int(time.time()))[0]
+    assert row["kid"] == kp.kid
+    assert row["n"] == base64url_encode_int(kp.private_key.public_key().public_numbers().n)
+
+def test_keystore_jwks_memoized_until_keys_change(rsa_key_material):
+    """JWKS is rebuilt only when the set of valid keys changes"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "keys.db")
+        with KeyStore(db_path) as store:
+            now = datetime.now()
+            now_ts = int(now.timestamp())
+            (first_pem, *first_public), (second_pem, *second_public), _ = rsa_key_material
+            store._db.save_key(first_pem, now_ts + 3600, *first_public)
+            
+            first = store.jwks(now)
+            assert store.jwks(now) is first
+            
+            store._db.save_key(second_pem, now_ts + 7200, *second_public)
+            second = store.jwks(now)
+            assert second is not first
+            assert len(second["keys"]) == 2
+            assert json.loads(store.jwks_bytes(now)) == second
+            
+            # A write through another connection (or process) invalidates it too
+            priv_pem, n, e = rsa_key_material[2]
+            with DatabaseManager(db_path) as other:
+                other.save_key(priv_pem, now_ts + 7200, n, e)
+            third = store.jwks(now)
+            assert third is not second
+            assert len(third["keys"]) == 3
+            
+            # The first key's expiry ends the memoized set's lifetime
+            later = store.jwks(now + timedelta(minutes=90))
+            assert len(later["keys"]) == 2
+
+def test_keystore_jwks_follows_other_writers(rsa_key_material):
+    """Keys added or removed through another KeyStore on the same file show up in the JWKS"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "keys.db")
+        now = int(time.time())
+        with KeyStore(db_path) as store, KeyStore(db_path) as other:
+            priv_pem, n, e = rsa_key_material[0]
+            kid = other._db.save_key(priv_pem, now + 3600, n, e)
+            assert store.find_signing_key().kid == kid
+            assert [k["kid"] for k in store.jwks()["keys"]] == [str(kid)]
+            
+            # A writer that leaves out the public columns still gets its key published
+            legacy_pem, legacy_n, _ = rsa_key_material[1]
+            other._db.save_key(legacy_pem, now + 5400)
+            assert store.jwks()["keys"][1]["n"] == legacy_n
+            
+            other._db.cleanup_expired_keys(now + 7200)
+            assert store.jwks()["keys"] == []
+
+def test_keystore_jwks_skips_unusable_keys(rsa_key_material, monkeypatch):
+    """A row whose key cannot be parsed or has vanished is left out instead of failing the JWKS"""
+    store = KeyStore(":memory:")
+    now = int(time.time())
+    priv_pem, n, e = rsa_key_material[0]
+    kid = store._db.save_key(priv_pem, now + 3600, n, e)
+    store._db.save_key(b"garbage", now + 5400)
+    assert [k["kid"] for k in store.jwks()["keys"]] == [str(kid)]
+    
+    # A legacy row deleted between the JWKS query and the key lookup
+    legacy_pem, _, _ = rsa_key_material[1]
+    store._db.save_key(legacy_pem, now + 7200)
+    monkeypatch.setattr(store._db, "get_key_by_id", lambda kid: None)
+    assert [k["kid"] for k in store.jwks()["keys"]] == [str(kid)]
+
+def test_keystore_jwks_sorted_by_expiry_and_reloaded(rsa_key_material):
+    """JWKS lists keys by expiry and a fresh KeyStore rebuilds the same set from the database"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "keys.db")
+        with KeyStore(db_path) as store:
+            now = datetime.now()
+            now_ts = int(now.timestamp())
+            store._db.save_keys_bulk([
+                (priv_pem, exp, n, e)
+                for (priv_pem, n, e), exp in zip(
+                    rsa_key_material, [now_ts + 7200, now_ts + 3600, now_ts - 3600]
+                )
+            ])
+            
+            jwks = store.jwks(now)
+            exps = [k["exp"] for k in jwks["keys"]]
+            assert len(exps) == 2
+            assert exps == sorted(exps)
+            with KeyStore(db_path) as reloaded:
+                assert reloaded.jwks(now) == jwks
+
+def test_keystore_generate_keys_bulk():
+    """Bulk generation saves every key and returns their kids in input order"""
+    store = KeyStore(":memory:")
+    now = datetime.now()
+    expiries = [now - timedelta(hours=1), now + timedelta(hours=1)]
+    
+    kids = store.generate_keys_bulk(expiries)
+    assert [kp.kid for kp in store.get_expired(now)] == [kids[0]]
+    assert [kp.kid for kp in store.get_unexpired(now)] == [kids[1]]
+    assert store.get_unexpired(now)[0].expiry_ts == int(expiries[1].timestamp())
+
+def test_keystore_backfills_public_keys(rsa_key_material):
+    """Keys saved without public parts get them when the KeyStore opens the database"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "keys.db")
+        key_pem, n, e = rsa_key_material[0]
+        exp_time = int(time.time()) + 3600
+        with DatabaseManager(db_path) as db:
+            kid = db.save_key(key_pem, exp_time)
         
-    finally:
-        os.close(db_fd)
-        os.unlink(db_path)
+        with KeyStore(db_path) as store:
+            rows = store._db.get_valid_public_keys(exp_time - 1)
+            assert [row["kid"] for row in rows] == [kid]
+            assert (rows[0]["n"], rows[0]["e"]) == (n, e)
+            assert store.jwks()["keys"][0]["n"] == rows[0]["n"]
+
+def test_keystore_reuses_parsed_private_keys(rsa_key_material):
+    """Loading the same key twice parses its PEM only once"""
+    store = KeyStore(":memory:")
+    now = datetime.now()
+    priv_pem, n, e = rsa_key_material[0]
+    store._db.save_key(priv_pem, int(now.timestamp()) + 3600, n, e)
+    
+    first = store.find_signing_key(now=now)
+    second = store.find_signing_key(now=now)
+    assert second.private_key is first.private_key
 
 # Utils Tests
-def test_base64url_encode_int():
+# Zero, small numbers, the RSA exponent, and 256-bit through RSA modulus widths
+@pytest.mark.parametrize("value", [0, 1, 123, 65537, 2**256 - 1, 2**2048 - 1, 2**4096 - 1])
+def test_base64url_encode_int(value):
     """Test base64url integer encoding"""
-    from jwks_server.utils import base64url_encode_int
-    
-    # Test small number
-    result = base64url_encode_int(123)
-    assert isinstance(result, str)
-    assert len(result) > 0
-    
-    # Test large number (RSA modulus size)
-    large_num = 2**2048 - 1
-    result = base64url_encode_int(large_num)
+    result = base64url_encode_int(value)
     assert isinstance(result, str)
     assert len(result) > 0
+    assert "=" not in result
+
+def test_base64url_decode_int():
+    """Decoding inverts base64url_encode_int"""
+    for value in (0, 123, 65537, 2**2048 - 1):
+        assert base64url_decode_int(base64url_encode_int(value)) == value
+
+def test_base64url_encode_bytes():
+    """Byte encoding is unpadded base64url, decodes back, and matches the integer encoder"""
+    assert base64url_encode_bytes(b"\xff\xfe") == "__4"
+    assert base64url_decode("__4") == b"\xff\xfe"
+    modulus = 2**2048 - 1
+    assert base64url_encode_bytes(modulus.to_bytes(256, "big")) == base64url_encode_int(modulus)
 
 # Error Handling Tests
 def test_database_edge_cases():
     """Test database edge cases"""
-    db_fd, db_path = tempfile.mkstemp()
+    now = int(time.time())
     
-    try:
-        db = DatabaseManager(db_path)
-        
+    with DatabaseManager(":memory:") as db:
         # Test get key by non-existent ID
         result = db.get_key_by_id(999999)
         assert result is None
         
         # Test cleanup expired keys
-        past_time = int(datetime.utcnow().timestamp()) - 3600
+        past_time = now - 3600
         deleted_count = db.cleanup_expired_keys(past_time)
         assert deleted_count >= 0
-        
-    finally:
-        os.close(db_fd)
-        os.unlink(db_path)
 
 def test_keystore_no_keys_available():
     """Test KeyStore when no keys are available"""
-    db_fd, db_path = tempfile.mkstemp()
+    store = KeyStore(":memory:")
+    now = datetime.now()
     
-    try:
-        store = KeyStore(db_path)
-        now = datetime.utcnow()
-        
-        # Test finding signing key when none exist
-        signing_key = store.find_signing_key(want_expired=False, now=now)
-        assert signing_key is None
-        
-        expired_signing_key = store.find_signing_key(want_expired=True, now=now)
-        assert expired_signing_key is None
-        
-        # Test JWKS with no keys
-        jwks = store.jwks(now)
-        assert jwks["keys"] == []
-        
-    finally:
-        os.close(db_fd)
-        os.unlink(db_path)
+    # Test finding signing key when none exist
+    signing_key = store.find_signing_key(want_expired=False, now=now)
+    assert signing_key is None
+    
+    expired_signing_key = store.find_signing_key(want_expired=True, now=now)
+    assert expired_signing_key is None
+    
+    # Test JWKS with no keys
+    jwks = store.jwks(now)
+    assert jwks["keys"] == []